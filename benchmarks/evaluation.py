@@ -0,0 +1,170 @@
+"""Benchmark basis function, surface evaluation and normal calculation
+throughput.
+
+Prints median wall-clock times, the number of executed ATen operators
+(a proxy for kernel launches) and the memory saved for backward.
+"""
+import argparse
+import time
+from typing import Callable, Tuple
+
+import torch as th
+
+import diff_nurbs
+
+
+def create_surface(
+        degree: int,
+        num_control_points: int,
+        device: th.device,
+) -> Tuple[th.Tensor, th.Tensor, th.Tensor]:
+    control_points = th.rand(
+        (num_control_points, num_control_points, 3), device=device)
+    control_point_weights = 0.5 + th.rand(
+        (num_control_points, num_control_points, 1), device=device)
+    knots = th.cat([
+        th.zeros(degree, device=device),
+        th.linspace(0, 1, num_control_points - degree + 1, device=device),
+        th.ones(degree, device=device),
+    ])
+    return control_points, control_point_weights, knots
+
+
+def synchronize(device: th.device) -> None:
+    if device.type == 'cuda':
+        th.cuda.synchronize(device)
+
+
+def time_ms(
+        func: Callable[[], object],
+        device: th.device,
+        repetitions: int,
+) -> float:
+    func()
+    times = []
+    for _ in range(repetitions):
+        synchronize(device)
+        start = time.perf_counter()
+        func()
+        synchronize(device)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1e3
+
+
+def count_ops(func: Callable[[], object]) -> int:
+    with th.profiler.profile() as profiler:
+        func()
+    return sum(
+        1 for event in profiler.events() if event.name.startswith('aten::'))
+
+
+def saved_megabytes(func: Callable[[], object]) -> float:
+    num_bytes = 0
+
+    def pack(tensor: th.Tensor) -> th.Tensor:
+        nonlocal num_bytes
+        num_bytes += tensor.numel() * tensor.element_size()
+        return tensor
+
+    with th.autograd.graph.saved_tensors_hooks(pack, lambda x: x):
+        func()
+    return num_bytes / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--num-points', type=int, default=200_000)
+    parser.add_argument('--num-control-points', type=int, default=16)
+    parser.add_argument('--degrees', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--repetitions', type=int, default=7)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = th.device(args.device)
+    th.manual_seed(0)
+    points_x = th.rand(args.num_points, device=device)
+    points_y = th.rand(args.num_points, device=device)
+
+    print(
+        f'{"degree":>6} {"benchmark":<28} {"ms":>9} {"ops":>6} '
+        f'{"saved MiB":>10}'
+    )
+    for degree in args.degrees:
+        control_points, control_point_weights, knots = create_surface(
+            degree, args.num_control_points, device)
+        spans = diff_nurbs.find_span(
+            points_x, degree, args.num_control_points, knots)
+        surface_args = (
+            points_x,
+            points_y,
+            degree,
+            degree,
+            control_points,
+            control_point_weights,
+            knots,
+            knots,
+        )
+
+        def normals_backward(manual_backward: bool) -> Callable[[], None]:
+            def run() -> None:
+                params = control_points.detach().requires_grad_()
+                normals = diff_nurbs.calc_normals_surface(
+                    points_x,
+                    points_y,
+                    degree,
+                    degree,
+                    params,
+                    control_point_weights,
+                    knots,
+                    knots,
+                    manual_backward=manual_backward,
+                )
+                normals.sum().backward()
+            return run
+
+        def forward_only(manual_backward: bool) -> Callable[[], None]:
+            def run() -> None:
+                params = control_points.detach().requires_grad_()
+                diff_nurbs.calc_normals_surface(
+                    points_x,
+                    points_y,
+                    degree,
+                    degree,
+                    params,
+                    control_point_weights,
+                    knots,
+                    knots,
+                    manual_backward=manual_backward,
+                )
+            return run
+
+        benchmarks = [
+            ('basis functions', lambda: diff_nurbs.calc_basis_derivs(
+                points_x, spans, degree, knots, 0), None),
+            ('basis derivatives (2nd)', lambda: diff_nurbs.calc_basis_derivs(
+                points_x, spans, degree, knots, 2), None),
+            ('evaluate', lambda: diff_nurbs.evaluate_nurbs_surface_flex(
+                *surface_args), None),
+            ('derivatives (1st)', lambda: diff_nurbs.calc_derivs_surface(
+                *surface_args, nth_deriv=1), None),
+            ('normals + backward', normals_backward(False),
+             forward_only(False)),
+            ('normals + manual backward', normals_backward(True),
+             forward_only(True)),
+        ]
+        for (name, func, forward_func) in benchmarks:
+            milliseconds = time_ms(func, device, args.repetitions)
+            num_ops = count_ops(func)
+            saved = (
+                f'{saved_megabytes(forward_func):10.1f}'
+                if forward_func is not None
+                else f'{"":>10}'
+            )
+            print(
+                f'{degree:>6} {name:<28} {milliseconds:9.1f} '
+                f'{num_ops:>6} {saved}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark mesh parameterization and least-squares surface fitting
+throughput on structured grids.
+
+Prints median wall-clock times per grid size, and for fitting a batch
+of small grids one at a time and batched.
+"""
+import argparse
+import time
+from typing import Callable
+
+import torch as th
+
+import diff_nurbs
+
+
+def create_grid(
+        num_points: int,
+        device: th.device,
+) -> th.Tensor:
+    xs = th.linspace(0, 1, num_points, device=device)
+    grid = th.stack([
+        xs.unsqueeze(-1).expand(-1, num_points),
+        xs.expand(num_points, -1),
+        0.1 * th.sin(6 * xs).unsqueeze(-1) * th.cos(4 * xs),
+    ], -1)
+    return grid + 1e-3 * th.randn_like(grid)
+
+
+def synchronize(device: th.device) -> None:
+    if device.type == 'cuda':
+        th.cuda.synchronize(device)
+
+
+def time_ms(
+        func: Callable[[], object],
+        device: th.device,
+        repetitions: int,
+) -> float:
+    func()
+    times = []
+    for _ in range(repetitions):
+        synchronize(device)
+        start = time.perf_counter()
+        func()
+        synchronize(device)
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--grid-sizes', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--num-control-points', type=int, default=32)
+    parser.add_argument(
+        '--solvers', nargs='+', default=['lu', 'banded-cholesky'])
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--batch-grid-size', type=int, default=64)
+    parser.add_argument('--repetitions', type=int, default=3)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = th.device(args.device)
+    th.manual_seed(0)
+
+    print(f'{"grid":>11} {"benchmark":<37} {"ms":>9}')
+    for grid_size in args.grid_sizes:
+        grid = create_grid(grid_size, device)
+        num_points = grid_size - 1
+
+        def mesh_params(parameterization: str) -> Callable[[], object]:
+            return lambda: diff_nurbs.get_mesh_params_(
+                grid, num_points, num_points, True, parameterization)
+
+        benchmarks = [
+            (f'mesh params ({parameterization})',
+             mesh_params(parameterization))
+            for parameterization in ['chord-length', 'centripetal', 'uniform']
+        ]
+
+        def approximate_surface(solver: str) -> Callable[[], object]:
+            return lambda: diff_nurbs.approximate_surface(
+                grid,
+                grid_size,
+                grid_size,
+                args.degree,
+                args.degree,
+                args.num_control_points,
+                args.num_control_points,
+                solver=solver,
+            )
+
+        benchmarks.extend(
+            (f'approximate surface ({solver})', approximate_surface(solver))
+            for solver in args.solvers
+        )
+        for (name, func) in benchmarks:
+            milliseconds = time_ms(func, device, args.repetitions)
+            print(
+                f'{grid_size:>5}x{grid_size:<5} {name:<37} '
+                f'{milliseconds:9.1f}'
+            )
+
+    print(f'\n{"batch":>11} {"benchmark":<37} {"ms":>9}')
+    grid_size = args.batch_grid_size
+    grids = th.stack([
+        create_grid(grid_size, device) for _ in range(args.batch_size)])
+
+    def fit_one_by_one(parameterization: str) -> Callable[[], object]:
+        return lambda: [
+            diff_nurbs.approximate_surface(
+                grid,
+                grid_size,
+                grid_size,
+                args.degree,
+                args.degree,
+                args.num_control_points,
+                args.num_control_points,
+                parameterization=parameterization,
+            )
+            for grid in grids
+        ]
+
+    def fit_batched(parameterization: str) -> Callable[[], object]:
+        return lambda: diff_nurbs.approximate_surface_batched(
+            grids,
+            args.degree,
+            args.degree,
+            args.num_control_points,
+            args.num_control_points,
+            parameterization=parameterization,
+        )
+
+    # Uniform parameters are shared by all grids.
+    for parameterization in ['chord-length', 'uniform']:
+        for (name, func) in [
+                (f'one by one ({parameterization})',
+                 fit_one_by_one(parameterization)),
+                (f'batched ({parameterization})',
+                 fit_batched(parameterization)),
+        ]:
+            milliseconds = time_ms(func, device, args.repetitions)
+            print(f'{args.batch_size:>11} {name:<37} {milliseconds:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""Benchmark point inversion throughput and convergence.
+
+Inverts points scattered around the example surface and prints the
+wall-clock time, Newton iterations per second, the fraction of
+converged points and a histogram of the per-point iteration counts for
+each step method.
+
+Before that, prints the wall-clock time and the mean seed distance of
+the flat and the coarse-to-fine start value searches.
+"""
+import argparse
+import itertools
+import time
+from typing import Callable, List, Tuple
+
+import torch as th
+
+import diff_nurbs
+
+
+def create_world_points(
+        surface: diff_nurbs.NURBSSurface,
+        num_points: int,
+        noise: float,
+) -> th.Tensor:
+    params = th.rand(
+        (num_points, 2),
+        dtype=surface.control_points.dtype,
+        device=surface.control_points.device,
+    )
+    world_points = surface.evaluate(params[:, 0], params[:, 1])
+    return world_points + noise * th.randn_like(world_points)
+
+
+def synchronize(device: th.device) -> None:
+    if device.type == 'cuda':
+        th.cuda.synchronize(device)
+
+
+def format_histogram(num_iters: th.Tensor, max_iters: int) -> str:
+    """Return counts of the iteration numbers, exact up to eight and in
+    power-of-two buckets above.
+    """
+    edges = list(range(9))
+    while edges[-1] < max_iters:
+        edges.append(min(2 * edges[-1], max_iters))
+    edges.append(max_iters + 1)
+
+    buckets: List[str] = []
+    for (lower, upper) in zip(edges, edges[1:]):
+        count = int(((num_iters >= lower) & (num_iters < upper)).sum())
+        if count == 0:
+            continue
+        name = f'{lower}' if upper == lower + 1 else f'{lower}-{upper - 1}'
+        buckets.append(f'{name}:{count}')
+    return ' '.join(buckets)
+
+
+def benchmark_seed_search(
+        surface: diff_nurbs.NURBSSurface,
+        world_points: th.Tensor,
+        device: th.device,
+) -> None:
+    surface_args = (
+        surface.degree_x,
+        surface.degree_y,
+        surface.control_points,
+        surface.control_point_weights,
+        surface.knots_x,
+        surface.knots_y,
+    )
+
+    def flat(num_samples: int) -> Callable[[], Tuple[th.Tensor, th.Tensor]]:
+        return lambda: diff_nurbs.get_inversion_start_values(
+            world_points, *surface_args, num_samples)
+
+    def hierarchical(
+            num_refine_samples: int,
+    ) -> Callable[[], Tuple[th.Tensor, th.Tensor]]:
+        return lambda: diff_nurbs.get_inversion_start_values_hierarchical(
+            world_points,
+            *surface_args,
+            8,
+            num_refine_samples=num_refine_samples,
+        )
+
+    for (name, func) in [
+            ('flat (8 samples)', flat(8)),
+            ('flat (32 samples)', flat(32)),
+            ('hierarchical (8 samples, refine 5)', hierarchical(5)),
+            ('hierarchical (8 samples, refine 9)', hierarchical(9)),
+    ]:
+        func()
+        synchronize(device)
+        start = time.perf_counter()
+        _, distances = func()
+        synchronize(device)
+        seconds = time.perf_counter() - start
+        print(
+            f'{len(world_points):>9} {name:<37} {seconds * 1e3:10.1f} '
+            f'{distances.mean().item():13.3e}'
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--num-points', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument(
+        '--check-intervals', type=int, nargs='+', default=[1, 4])
+    parser.add_argument(
+        '--step-methods',
+        nargs='+',
+        default=['newton', 'levenberg-marquardt'],
+    )
+    parser.add_argument('--noise', type=float, default=1e-2)
+    parser.add_argument('--max-iters', type=int, default=100)
+    parser.add_argument('--double', action='store_true')
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    device = th.device(args.device)
+    th.manual_seed(0)
+    surface = diff_nurbs.NURBSSurface.create_example(device=device)
+    if args.double:
+        surface.control_points = surface.control_points.double()
+        surface.control_point_weights = (
+            surface.control_point_weights.double())
+        surface.knots_x = surface.knots_x.double()
+        surface.knots_y = surface.knots_y.double()
+
+    print(
+        f'{"points":>9} {"seed search":<37} {"ms":>10} '
+        f'{"mean distance":>13}'
+    )
+    for num_points in args.num_points:
+        benchmark_seed_search(
+            surface,
+            create_world_points(surface, num_points, args.noise),
+            device,
+        )
+
+    print(
+        f'\n{"points":>9} {"step method":<19} {"interval":>8} {"ms":>10} '
+        f'{"iters":>6} {"iters/s":>8} {"Mpt-it/s":>8} {"checks":>6} '
+        f'{"converged":>9}  iteration histogram'
+    )
+    for num_points in args.num_points:
+        world_points = create_world_points(surface, num_points, args.noise)
+        for (step_method, check_interval) in itertools.product(
+                args.step_methods, args.check_intervals):
+            diagnostics = diff_nurbs.InversionDiagnostics()
+            synchronize(device)
+            start = time.perf_counter()
+            diff_nurbs.invert_points(
+                world_points,
+                surface.degree_x,
+                surface.degree_y,
+                surface.control_points,
+                surface.control_point_weights,
+                surface.knots_x,
+                surface.knots_y,
+                max_iters=args.max_iters,
+                diagnostics=diagnostics,
+                check_interval=check_interval,
+                step_method=step_method,
+                raise_on_failure=False,
+            )
+            synchronize(device)
+            seconds = time.perf_counter() - start
+
+            assert diagnostics.converged is not None
+            assert diagnostics.num_iters is not None
+            num_iters = diagnostics.num_iters.cpu()
+            # The loop runs as long as the slowest point.
+            num_loop_iters = int(num_iters.max())
+            point_iters_per_second = int(num_iters.sum()) / seconds
+            converged = diagnostics.converged.float().mean().item()
+            print(
+                f'{num_points:>9} {step_method:<19} {check_interval:>8} '
+                f'{seconds * 1e3:10.1f} {num_loop_iters:>6} '
+                f'{num_loop_iters / seconds:8.1f} '
+                f'{point_iters_per_second / 1e6:8.2f} '
+                f'{len(diagnostics.active_set_sizes):>6} {converged:9.2%}  '
+                f'{format_histogram(num_iters, args.max_iters)}'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import pytest
+import torch as th
+
+import diff_nurbs
+
+
+def create_knots(degree: int, num_control_points: int) -> th.Tensor:
+    generator = th.Generator().manual_seed(degree)
+    inner_knots = th.rand(
+        num_control_points - degree - 1,
+        generator=generator,
+        dtype=th.float64,
+    ).sort().values
+    return th.cat([
+        th.zeros(degree + 1, dtype=th.float64),
+        inner_knots,
+        th.ones(degree + 1, dtype=th.float64),
+    ])
+
+
+@pytest.mark.parametrize('degree', [1, 2, 3, 5])
+def test_basis_derivs(degree):
+    num_control_points = 9
+    knots = create_knots(degree, num_control_points)
+    points = th.rand(200, dtype=th.float64)
+    spans = diff_nurbs.find_span(points, degree, num_control_points, knots)
+    derivs = diff_nurbs.calc_basis_derivs(points, spans, degree, knots, 2)
+    assert derivs.shape == (200, 3, degree + 1)
+    basis = diff_nurbs.calc_basis_derivs(points, spans, degree, knots, 0)
+    assert th.allclose(basis[:, 0], derivs[:, 0])
+    assert th.allclose(
+        diff_nurbs.get_basis(points, spans, degree, knots), derivs[:, 0])
+    assert th.allclose(basis.sum(-1), th.ones_like(points))
+
+    step = 1e-6
+    finite_differences = (
+        diff_nurbs.get_basis(points + step, spans, degree, knots)
+        - diff_nurbs.get_basis(points - step, spans, degree, knots)
+    ) / (2 * step)
+    assert th.allclose(derivs[:, 1], finite_differences, atol=1e-5)
+
+
+@pytest.mark.parametrize('nth_deriv', [0, 2])
+def test_basis_derivs_are_differentiable(nth_deriv):
+    degree = 3
+    # Closely spaced knots or points near them make the finite
+    # differences of the checks inaccurate.
+    knots = th.cat([
+        th.zeros(degree, dtype=th.float64),
+        th.linspace(0, 1, 5, dtype=th.float64),
+        th.ones(degree, dtype=th.float64),
+    ]).requires_grad_()
+    points = th.linspace(0.1, 0.9, 9, dtype=th.float64).requires_grad_()
+    spans = diff_nurbs.find_span(points.detach(), degree, 7, knots.detach())
+
+    def calc(points: th.Tensor, knots: th.Tensor) -> th.Tensor:
+        return diff_nurbs.calc_basis_derivs(
+            points, spans, degree, knots, nth_deriv)
+
+    assert th.autograd.gradcheck(calc, (points, knots))
+    assert th.autograd.gradgradcheck(calc, (points, knots))
+
+
+@pytest.mark.parametrize('degree', [1, 2, 3, 5])
+@pytest.mark.parametrize('uniform', [False, True])
+def test_bezier_basis_derivs_match_default(degree, uniform):
+    num_control_points = 9
+    if uniform:
+        knots = th.cat([
+            th.zeros(degree, dtype=th.float64),
+            th.linspace(
+                0, 1, num_control_points - degree + 1, dtype=th.float64),
+            th.ones(degree, dtype=th.float64),
+        ])
+    else:
+        knots = create_knots(degree, num_control_points)
+    extraction = diff_nurbs.calc_bezier_extraction(
+        degree, num_control_points, knots)
+    assert extraction.uniform == uniform
+    points = th.rand(200, dtype=th.float64)
+    spans, derivs = diff_nurbs.calc_basis_derivs_bezier(
+        points, extraction, 2)
+    expected_spans, expected_derivs = diff_nurbs.calc_spans_and_basis_derivs(
+        points, degree, num_control_points, knots, 2)
+    assert th.equal(spans, expected_spans)
+    assert th.allclose(derivs, expected_derivs)
+
+
+def test_basis_cache():
+    degree = 3
+    num_control_points = 9
+    knots = create_knots(degree, num_control_points)
+    points = th.rand(50, dtype=th.float64)
+    expected = diff_nurbs.calc_spans_and_basis_derivs(
+        points, degree, num_control_points, knots, 2)
+
+    assert diff_nurbs.get_basis_cache() is None
+    with diff_nurbs.BasisCache() as cache:
+        assert diff_nurbs.get_basis_cache() is cache
+        for nth_deriv in [2, 2, 1]:
+            spans, basis_derivs = diff_nurbs.calc_spans_and_basis_derivs(
+                points, degree, num_control_points, knots, nth_deriv)
+            assert th.equal(spans, expected[0])
+            assert th.equal(basis_derivs, expected[1][:, :nth_deriv + 1])
+        assert cache.stats()['hits'] == 2
+        assert cache.stats()['misses'] == 1
+
+        # In-place modifications invalidate entries.
+        points[0] = 0.5
+        diff_nurbs.calc_spans_and_basis_derivs(
+            points, degree, num_control_points, knots, 2)
+        assert cache.stats()['misses'] == 2
+        assert len(cache) == 1
+
+        # Inputs requiring gradients are never cached.
+        points.requires_grad_()
+        diff_nurbs.calc_spans_and_basis_derivs(
+            points, degree, num_control_points, knots, 2)
+        assert cache.stats()['hits'] == 2
+    assert diff_nurbs.get_basis_cache() is None
+
+
+def test_basis_cache_evicts_least_recently_used():
+    degree = 3
+    num_control_points = 9
+    knots = create_knots(degree, num_control_points)
+    points = [th.rand(100, dtype=th.float64) for _ in range(3)]
+    cache = diff_nurbs.BasisCache(max_bytes=10_000)
+    prev_cache = diff_nurbs.set_basis_cache(cache)
+    try:
+        for curr_points in points + points[-1:]:
+            diff_nurbs.calc_spans_and_basis_derivs(
+                curr_points, degree, num_control_points, knots, 1)
+    finally:
+        diff_nurbs.set_basis_cache(prev_cache)
+    # Each entry takes 100 * 8 + 100 * 2 * 4 * 8 = 7200 bytes.
+    assert len(cache) == 1
+    assert cache.num_bytes <= cache.max_bytes
+    assert cache.stats()['hits'] == 1
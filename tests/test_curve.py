@@ -0,0 +1,88 @@
+import torch as th
+
+import diff_nurbs
+
+
+def create_curve(
+        degree: int = 3,
+        num_control_points: int = 7,
+) -> diff_nurbs.NURBSCurve:
+    generator = th.Generator().manual_seed(0)
+    # Increasing x-coordinates avoid self-intersections.
+    control_points = th.stack([
+        th.linspace(0, 1, num_control_points, dtype=th.float64),
+        th.rand(num_control_points, generator=generator, dtype=th.float64),
+    ], -1)
+    control_point_weights = 0.5 + th.rand(
+        (num_control_points, 1), generator=generator, dtype=th.float64)
+    knots = th.cat([
+        th.zeros(degree),
+        th.linspace(0, 1, num_control_points - degree + 1),
+        th.ones(degree),
+    ]).double()
+    return diff_nurbs.NURBSCurve(
+        degree, control_points, control_point_weights, knots)
+
+
+def test_evaluate_matches_derivs():
+    curve = create_curve()
+    points = th.linspace(0, 1, 101, dtype=th.float64)
+    curve_points = curve.evaluate(points)
+    assert curve_points.shape == (101, 2)
+    derivs = curve.calc_derivs(points, nth_deriv=2)
+    assert derivs.shape == (101, 3, 2)
+    assert th.allclose(curve_points, derivs[:, 0])
+
+
+def test_batched_derivs_match_single_points():
+    curve = create_curve()
+    points = th.rand(20, dtype=th.float64)
+    derivs = curve.calc_derivs(points, nth_deriv=3)
+    for (point, point_derivs) in zip(points, derivs):
+        assert th.allclose(curve.calc_derivs(point, nth_deriv=3), point_derivs)
+
+
+def test_derivs_match_finite_differences():
+    curve = create_curve()
+    points = th.linspace(0.05, 0.95, 19, dtype=th.float64)
+    step = 1e-6
+    derivs = curve.calc_derivs(points, nth_deriv=1)
+    finite_differences = (
+        curve.evaluate(points + step) - curve.evaluate(points - step)
+    ) / (2 * step)
+    assert th.allclose(derivs[:, 1], finite_differences, atol=1e-6)
+
+
+def test_invert_recovers_parameters():
+    curve = create_curve()
+    points = th.rand(200, dtype=th.float64)
+    world_points = curve.evaluate(points)
+    evaluation_points, distances = curve.invert(
+        world_points, distance_tolerance=1e-9, chunk_size=64)
+    assert evaluation_points.shape == (200,)
+    assert (distances <= 1e-6).all()
+    assert th.allclose(curve.evaluate(evaluation_points), world_points)
+
+
+def test_invert_without_raising():
+    curve = create_curve()
+    world_points = th.rand((50, 2), dtype=th.float64) * 3
+    evaluation_points, distances = curve.invert(
+        world_points, max_iters=1, raise_on_failure=False)
+    assert evaluation_points.shape == (50,)
+    assert ((evaluation_points >= 0) & (evaluation_points <= 1)).all()
+
+
+def test_power_basis_matches_default():
+    curve = create_curve()
+    power_basis = curve.calc_power_basis()
+    points = th.rand(100, dtype=th.float64)
+    assert th.allclose(
+        curve.evaluate(points, power_basis=power_basis),
+        curve.evaluate(points),
+    )
+    spans = curve.find_span(points)
+    assert th.allclose(
+        diff_nurbs.calc_basis_derivs_power(points, spans, power_basis, 4),
+        curve.calc_basis_derivs(points, spans, 4),
+    )
@@ -0,0 +1,326 @@
+import pytest
+import torch as th
+
+import diff_nurbs
+from diff_nurbs import nurbs
+
+
+def create_grid(
+        num_points_x: int = 12,
+        num_points_y: int = 9,
+        seed: int = 0,
+) -> th.Tensor:
+    generator = th.Generator().manual_seed(seed)
+    xs = th.linspace(0, 1, num_points_x, dtype=th.float64)
+    ys = th.linspace(0, 2, num_points_y, dtype=th.float64)
+    # Unevenly spaced points make the parameterizations differ.
+    xs = xs + 0.3 * xs * (1 - xs)
+    grid = th.stack([
+        xs.unsqueeze(-1).expand(-1, num_points_y),
+        ys.expand(num_points_x, -1),
+        th.rand(
+            (num_points_x, num_points_y),
+            generator=generator,
+            dtype=th.float64,
+        ) * 0.2,
+    ], -1)
+    return grid
+
+
+def mesh_params_loop(grid: th.Tensor, exponent: float) -> th.Tensor:
+    """Return the averaged parameters along the first grid direction
+    with one row at a time.
+    """
+    params = th.zeros(len(grid), dtype=grid.dtype)
+    num_nondegenerate = 0
+    for col in range(grid.shape[1]):
+        cds = [
+            th.linalg.norm(grid[k, col] - grid[k - 1, col])**exponent
+            for k in range(1, len(grid))
+        ]
+        total = sum(cds)
+        if total == 0:
+            continue
+        num_nondegenerate += 1
+        params += th.cat([th.zeros(1), th.cumsum(th.stack(cds), 0)]) / total
+    return params / num_nondegenerate
+
+
+@pytest.mark.parametrize('parameterization,exponent', [
+    ('chord-length', 1.0),
+    ('centripetal', 0.5),
+])
+def test_mesh_params_match_loop(parameterization, exponent):
+    grid = create_grid()
+    # A degenerate column is skipped in the average.
+    grid[:, 3] = grid[:1, 3]
+    flat_points = grid.reshape(-1, 3)
+    params_x, params_y = diff_nurbs.get_mesh_params(
+        flat_points, 11, 8, parameterization)
+    assert th.allclose(params_x, mesh_params_loop(grid, exponent))
+    assert th.allclose(
+        params_y, mesh_params_loop(grid.transpose(0, 1), exponent))
+    assert params_x[0] == 0 and params_x[-1] == 1
+
+    params = diff_nurbs.get_mesh_params_(grid, 11, 8, True, parameterization)
+    assert th.allclose(params, params_x)
+
+
+def test_mesh_params_uniform_and_batched():
+    grid = create_grid()
+    params = diff_nurbs.get_mesh_params_(grid, 11, 8, True, 'uniform')
+    assert th.allclose(params, th.linspace(0, 1, 12, dtype=th.float64))
+
+    grids = th.stack([create_grid(seed=seed) for seed in range(3)])
+    batched_params = diff_nurbs.get_mesh_params_(grids, 8, 11, False)
+    assert batched_params.shape == (3, 9)
+    for (grid, params) in zip(grids, batched_params):
+        assert th.allclose(
+            params, diff_nurbs.get_mesh_params_(grid, 8, 11, False))
+
+
+def test_mesh_params_raise_for_degenerate_points():
+    grid = th.zeros((5, 4, 3), dtype=th.float64)
+    with pytest.raises(ValueError):
+        diff_nurbs.get_mesh_params_(grid, 4, 3, True)
+
+
+def create_smooth_grid(
+        num_points_x: int = 30,
+        num_points_y: int = 25,
+) -> th.Tensor:
+    xs = th.linspace(0, 1, num_points_x, dtype=th.float64)
+    ys = th.linspace(0, 1, num_points_y, dtype=th.float64)
+    (xs, ys) = th.meshgrid(xs, ys, indexing='ij')
+    return th.stack([xs, ys, 0.2 * th.sin(3 * xs) * th.cos(2 * ys)], -1)
+
+
+def evaluate_fit(
+        control_points: th.Tensor,
+        knots_x: th.Tensor,
+        knots_y: th.Tensor,
+        params_x: th.Tensor,
+        params_y: th.Tensor,
+) -> th.Tensor:
+    surface = diff_nurbs.NURBSSurface(
+        3,
+        3,
+        control_points,
+        th.ones(control_points.shape[:-1] + (1,), dtype=th.float64),
+        knots_x,
+        knots_y,
+    )
+    (params_x, params_y) = th.meshgrid(params_x, params_y, indexing='ij')
+    return surface.evaluate(
+        params_x.reshape(-1), params_y.reshape(-1),
+    ).reshape(params_x.shape + (3,))
+
+
+def test_approximate_surface_fits_grid():
+    grid = create_smooth_grid()
+    control_points, knots_x, knots_y = diff_nurbs.approximate_surface(
+        grid, 30, 25, 3, 3, 10, 8)
+    assert control_points.shape == (10, 8, 3)
+    assert knots_x.shape == (14,) and knots_y.shape == (12,)
+    assert knots_x.dtype == th.float64
+
+    flat_results = diff_nurbs.approximate_surface(
+        grid.reshape(-1, 3), 30, 25, 3, 3, 10, 8)
+    for (result, flat_result) in zip(
+            (control_points, knots_x, knots_y), flat_results):
+        assert th.equal(result, flat_result)
+
+    # Corners are interpolated, the rest is approximated closely.
+    for (i, j) in [(0, 0), (0, -1), (-1, 0), (-1, -1)]:
+        assert th.allclose(control_points[i, j], grid[i, j])
+    params_x, params_y = diff_nurbs.get_mesh_params(
+        grid.reshape(-1, 3), 29, 24)
+    fitted = evaluate_fit(
+        control_points, knots_x, knots_y, params_x, params_y)
+    assert (fitted - grid).abs().max() <= 1e-4
+
+
+def dense_from_band(band: th.Tensor) -> th.Tensor:
+    size = band.shape[-1]
+    dense = band.new_zeros(band.shape[:-2] + (size, size))
+    for d in range(band.shape[-2]):
+        indices = th.arange(size - d)
+        dense[..., indices + d, indices] = band[..., d, :size - d]
+    return dense
+
+
+def test_banded_normal_matrix_and_rhs_match_dense():
+    grid = create_smooth_grid()
+    params = diff_nurbs.get_mesh_params_(grid, 29, 24, True)
+    knots = diff_nurbs.place_knots(params, 9, 3)
+    spans, basis = diff_nurbs.calc_basis_band(params, 9, 3, knots)
+    assert spans.shape == (28,) and basis.shape == (28, 4)
+
+    N = diff_nurbs.calc_basis_mat(params, 9, 3, knots)
+    band = diff_nurbs.calc_basisTbasis_banded(spans, basis, 9, 3)
+    assert band.shape == (4, 8)
+    NTN = diff_nurbs.calc_basisTbasis(N)
+    assert th.allclose(th.tril(dense_from_band(band)), th.tril(NTN))
+    assert th.allclose(
+        diff_nurbs.calc_R_banded(grid, spans, basis, 3, 9),
+        diff_nurbs.calc_R(grid, params, N, 3, 9, knots),
+    )
+
+
+@pytest.mark.parametrize('in_row_dir', [True, False])
+def test_calc_R_accepts_deprecated_column_signature(in_row_dir):
+    grid = create_smooth_grid()
+    (num_points, num_other_points) = (
+        (29, 24) if in_row_dir else (24, 29))
+    params = diff_nurbs.get_mesh_params_(
+        grid, num_points, num_other_points, in_row_dir)
+    knots = diff_nurbs.place_knots(params, 9, 3)
+    N = diff_nurbs.calc_basis_mat(params, 9, 3, knots)
+    fitting_grid = grid if in_row_dir else grid.transpose(0, 1)
+    R = diff_nurbs.calc_R(fitting_grid, params, N, 3, 9, knots)
+
+    for world_points in [grid, grid.reshape(-1, 3)]:
+        with pytest.warns(DeprecationWarning):
+            column_R = diff_nurbs.calc_R(
+                world_points,
+                5,
+                params,
+                num_other_points,
+                N,
+                3,
+                9,
+                knots,
+                in_row_dir,
+            )
+        assert th.allclose(column_R, R.reshape(8, -1, 3)[:, 5])
+
+
+# Small blocks couple several blocks, including a shorter last one.
+@pytest.mark.parametrize('block_size', [64, 7, 1])
+def test_banded_cholesky_matches_dense(monkeypatch, block_size):
+    monkeypatch.setattr(nurbs, '_BANDED_CHOLESKY_BLOCK_SIZE', block_size)
+    generator = th.Generator().manual_seed(0)
+    # Symmetric positive definite batched matrices with bandwidth 3.
+    band = th.rand((2, 4, 50), generator=generator, dtype=th.float64)
+    band[:, 0] += 8
+    matrix = dense_from_band(band)
+    matrix = matrix + th.tril(matrix, -1).transpose(-2, -1)
+    factor = diff_nurbs.banded_cholesky(band)
+    assert factor.shape == band.shape
+    assert th.allclose(
+        dense_from_band(factor), th.linalg.cholesky(matrix))
+
+    b = th.rand((2, 50, 6), generator=generator, dtype=th.float64)
+    assert th.allclose(
+        diff_nurbs.banded_cholesky_solve(b, factor),
+        th.linalg.solve(matrix, b),
+    )
+
+
+def test_approximate_surface_solvers_match():
+    grid = create_smooth_grid()
+    results = diff_nurbs.approximate_surface(grid, 30, 25, 3, 3, 10, 8)
+    banded_results = diff_nurbs.approximate_surface(
+        grid, 30, 25, 3, 3, 10, 8, solver='banded-cholesky')
+    for (result, banded_result) in zip(results, banded_results):
+        assert th.allclose(result, banded_result)
+
+
+@pytest.mark.parametrize('use_sparse_csr', [
+    pytest.param(True, marks=pytest.mark.skipif(
+        not nurbs._USE_SPARSE_CSR, reason='sparse CSR is not supported')),
+    False,
+])
+def test_approximate_surface_scattered_matches_dense_least_squares(
+        monkeypatch,
+        use_sparse_csr,
+):
+    monkeypatch.setattr(nurbs, '_USE_SPARSE_CSR', use_sparse_csr)
+    generator = th.Generator().manual_seed(0)
+    params = th.rand((2000, 2), generator=generator, dtype=th.float64)
+    # Leave a hole in the point cloud.
+    params = params[(params - 0.5).norm(dim=-1) >= 0.15]
+    world_points = th.cat([
+        params,
+        (0.2 * th.sin(3 * params[:, 0]) * th.cos(2 * params[:, 1]))
+        .unsqueeze(-1),
+    ], -1)
+    control_points, knots_x, knots_y = (
+        diff_nurbs.approximate_surface_scattered(
+            world_points,
+            3,
+            3,
+            8,
+            8,
+            params_x=params[:, 0],
+            params_y=params[:, 1],
+            tolerance=1e-12,
+        ))
+    assert control_points.shape == (8, 8, 3)
+    assert knots_x.shape == (12,) and knots_y.shape == (12,)
+
+    operator = diff_nurbs.calc_evaluation_operators_surface(
+        params[:, 0], params[:, 1], 3, 3, 8, 8, knots_x, knots_y)[0][0]
+    assert operator.layout == (
+        th.sparse_csr if use_sparse_csr else th.sparse_coo)
+    assert len(nurbs._get_sparse_entries(operator)[2]) == len(params) * 16
+    dense_operator = operator.to_dense()
+    expected = th.linalg.lstsq(dense_operator, world_points).solution
+    assert th.allclose(control_points.reshape(64, 3), expected, atol=1e-9)
+
+    regularized_control_points, _, _ = (
+        diff_nurbs.approximate_surface_scattered(
+            world_points,
+            3,
+            3,
+            8,
+            8,
+            params_x=params[:, 0],
+            params_y=params[:, 1],
+            regularization=1e-2,
+            tolerance=1e-12,
+        ))
+    expected = th.linalg.solve(
+        dense_operator.T @ dense_operator
+        + 1e-2 * th.eye(64, dtype=th.float64),
+        dense_operator.T @ world_points,
+    )
+    assert th.allclose(
+        regularized_control_points.reshape(64, 3), expected, atol=1e-9)
+
+
+@pytest.mark.parametrize('solver', ['lu', 'banded-cholesky'])
+@pytest.mark.parametrize('scales,shared', [
+    # Mirrored grids have the same parameters.
+    ([1.0, -1.0], True),
+    ([1.0, 0.5, -1.0], False),
+])
+def test_approximate_surface_batched_matches_single(solver, scales, shared):
+    grids = th.stack([
+        create_smooth_grid() * th.tensor([1, 1, scale], dtype=th.float64)
+        for scale in scales
+    ])
+    control_points, knots_x, knots_y = diff_nurbs.approximate_surface_batched(
+        grids, 3, 3, 10, 8, solver=solver)
+    assert control_points.shape == (len(scales), 10, 8, 3)
+    assert knots_x.ndim == knots_y.ndim == (1 if shared else 2)
+
+    for (i, grid) in enumerate(grids):
+        results = diff_nurbs.approximate_surface(
+            grid, 30, 25, 3, 3, 10, 8, solver=solver)
+        assert th.allclose(control_points[i], results[0])
+        assert th.allclose(knots_x if shared else knots_x[i], results[1])
+        assert th.allclose(knots_y if shared else knots_y[i], results[2])
+
+    points = th.linspace(0, 1, 7, dtype=th.float64)
+    surface_points = diff_nurbs.evaluate_nurbs_surface_flex(
+        points,
+        points,
+        3,
+        3,
+        control_points,
+        th.ones((len(scales), 10, 8, 1), dtype=th.float64),
+        knots_x,
+        knots_y,
+    )
+    assert surface_points.shape == (len(scales), 7, 3)
@@ -0,0 +1,339 @@
+import pytest
+import torch as th
+
+import diff_nurbs
+from diff_nurbs import nurbs
+
+
+def create_surface() -> diff_nurbs.NURBSSurface:
+    surface = diff_nurbs.NURBSSurface.create_example()
+    surface.control_points = surface.control_points.double()
+    surface.control_point_weights = surface.control_point_weights.double()
+    surface.knots_x = surface.knots_x.double()
+    surface.knots_y = surface.knots_y.double()
+    return surface
+
+
+def surface_args(surface: diff_nurbs.NURBSSurface) -> tuple:
+    return (
+        surface.degree_x,
+        surface.degree_y,
+        surface.control_points,
+        surface.control_point_weights,
+        surface.knots_x,
+        surface.knots_y,
+    )
+
+
+def random_params(num_points: int, seed: int = 0) -> th.Tensor:
+    generator = th.Generator().manual_seed(seed)
+    return th.rand((num_points, 2), generator=generator, dtype=th.float64)
+
+
+def points_on_surface(
+        surface: diff_nurbs.NURBSSurface,
+        params: th.Tensor,
+) -> th.Tensor:
+    return surface.evaluate(params[:, 0], params[:, 1])
+
+
+@pytest.mark.parametrize('segment_amin', [
+    nurbs._segment_amin,
+    nurbs._segment_amin_padded,
+])
+def test_sample_index_matches_brute_force(monkeypatch, segment_amin):
+    monkeypatch.setattr(nurbs, '_segment_amin', segment_amin)
+    generator = th.Generator().manual_seed(0)
+    sample_points = th.rand((500, 3), generator=generator)
+    sample_params = th.rand((500, 2), generator=generator)
+    index = diff_nurbs.SurfaceSampleIndex(
+        sample_points, sample_params, chunk_size=64)
+    query_points = th.rand((300, 3), generator=generator) * 1.4 - 0.2
+    nearest = index.query(query_points)
+    expected = th.cdist(query_points, sample_points).argmin(-1)
+    assert th.allclose(
+        (query_points - sample_points[nearest]).norm(dim=-1),
+        (query_points - sample_points[expected]).norm(dim=-1),
+    )
+
+
+def test_start_values_with_index_match_brute_force():
+    surface = create_surface()
+    world_points = points_on_surface(surface, random_params(200))
+    index = diff_nurbs.build_inversion_index(*surface_args(surface), 8)
+    start_values, distances = diff_nurbs.get_inversion_start_values(
+        world_points, *surface_args(surface), 8, sample_index=index)
+    assert start_values.shape == (200, 2)
+    expected = th.cdist(world_points, index.sample_points).amin(-1)
+    assert th.allclose(distances, expected)
+
+
+def test_hierarchical_start_values_are_closer():
+    surface = create_surface()
+    world_points = points_on_surface(surface, random_params(200))
+    _, coarse_distances = diff_nurbs.get_inversion_start_values(
+        world_points, *surface_args(surface), 4)
+    start_values, distances = (
+        diff_nurbs.get_inversion_start_values_hierarchical(
+            world_points, *surface_args(surface), 4, chunk_size=64))
+    assert start_values.shape == (200, 2)
+    # `th.cdist` in the coarse search is only accurate up to about 1e-8.
+    assert (distances <= coarse_distances + 1e-6).all()
+
+
+def test_invert_points_with_hierarchical_seeds_recovers_parameters():
+    surface = create_surface()
+    params = random_params(200)
+    world_points = points_on_surface(surface, params)
+    _, fine_distances = diff_nurbs.get_inversion_start_values(
+        world_points, *surface_args(surface), 32)
+    # Nine refined samples per direction subdivide each cell in four,
+    # like the flat search with 32 samples.
+    _, distances = diff_nurbs.get_inversion_start_values_hierarchical(
+        world_points, *surface_args(surface), 8, num_refine_samples=9)
+    assert distances.mean() <= 1.25 * fine_distances.mean()
+
+    diagnostics = diff_nurbs.InversionDiagnostics()
+    evaluation_points, distances = diff_nurbs.invert_points(
+        world_points,
+        *surface_args(surface),
+        diagnostics=diagnostics,
+        num_seed_candidates=4,
+    )
+    assert (distances <= 1e-5).all()
+    assert th.allclose(evaluation_points, params, atol=1e-4)
+    assert (diagnostics.num_iters <= 5).all()
+
+
+def test_invert_points_shrinks_working_set():
+    surface = create_surface()
+    world_points = points_on_surface(surface, random_params(200))
+    results = []
+    for check_interval in [1, 4]:
+        diagnostics = diff_nurbs.InversionDiagnostics()
+        evaluation_points, distances = diff_nurbs.invert_points(
+            world_points,
+            *surface_args(surface),
+            diagnostics=diagnostics,
+            check_interval=check_interval,
+        )
+        assert evaluation_points.shape == (200, 2)
+        assert distances.shape == (200,)
+        sizes = diagnostics.active_set_sizes
+        assert sizes[0] == 200 and sizes[-1] == 0
+        assert all(
+            size >= next_size for (size, next_size) in zip(sizes, sizes[1:]))
+        assert diagnostics.converged.all()
+        assert (diagnostics.num_iters <= 100).all()
+        results.append((evaluation_points, distances, len(sizes)))
+    # Checking less often needs fewer synchronizing checks but yields
+    # the same points.
+    assert results[1][2] < results[0][2]
+    assert th.allclose(results[0][0], results[1][0], atol=1e-4)
+    assert th.allclose(results[0][1], results[1][1], atol=1e-4)
+
+
+@pytest.mark.parametrize('dtype', [th.float32, th.float64])
+def test_levenberg_marquardt_converges_off_surface(dtype):
+    surface = create_surface()
+    args = [
+        arg.to(dtype) if isinstance(arg, th.Tensor) else arg
+        for arg in surface_args(surface)
+    ]
+    generator = th.Generator().manual_seed(1)
+    world_points = points_on_surface(surface, random_params(1000)) + 1e-2 * (
+        th.randn((1000, 3), generator=generator, dtype=th.float64))
+    world_points = world_points.to(dtype)
+
+    newton_points, newton_distances = diff_nurbs.invert_points(
+        world_points, *args, raise_on_failure=False)
+    diagnostics = diff_nurbs.InversionDiagnostics()
+    evaluation_points, distances = diff_nurbs.invert_points(
+        world_points,
+        *args,
+        diagnostics=diagnostics,
+        step_method='levenberg-marquardt',
+    )
+    assert evaluation_points.shape == (1000, 2)
+    assert ((evaluation_points >= 0) & (evaluation_points <= 1)).all()
+    assert diagnostics.converged.all()
+    assert (diagnostics.num_iters <= 15).all()
+    # Damped steps never end up farther away than plain Newton steps.
+    assert (distances <= newton_distances + 1e-5).all()
+
+
+def create_collapsed_surface() -> diff_nurbs.NURBSSurface:
+    # The bicubic surface `(u * v, v, 0)`, whose edge at `v = 0`
+    # collapses to a single point.
+    params = th.linspace(0, 1, 4, dtype=th.float64)
+    (params_x, params_y) = th.meshgrid(params, params, indexing='ij')
+    knots = th.tensor([0, 0, 0, 0, 1, 1, 1, 1], dtype=th.float64)
+    return diff_nurbs.NURBSSurface(
+        3,
+        3,
+        th.stack([
+            params_x * params_y, params_y, th.zeros_like(params_x)], -1),
+        th.ones((4, 4, 1), dtype=th.float64),
+        knots,
+        knots.clone(),
+    )
+
+
+@pytest.mark.parametrize('step_method', ['newton', 'levenberg-marquardt'])
+def test_singular_systems_are_not_reported_as_converged(step_method):
+    surface = create_collapsed_surface()
+    # Points close to the collapsed edge are seeded on it, where the
+    # inversion systems are singular.
+    ys = th.tensor([0.01, 0.02, 0.03, 0.5], dtype=th.float64)
+    world_points = th.stack([0.5 * ys, ys, th.zeros_like(ys)], -1)
+    world_points[:3, 0] = 0
+    diagnostics = diff_nurbs.InversionDiagnostics()
+    _, distances = diff_nurbs.invert_points(
+        world_points,
+        *surface_args(surface),
+        diagnostics=diagnostics,
+        step_method=step_method,
+        raise_on_failure=False,
+    )
+    assert (distances[diagnostics.converged] <= 1e-5).all()
+    if step_method == 'newton':
+        # Gradient steps leave the collapsed edge.
+        assert diagnostics.converged.all()
+
+    result = diff_nurbs.invert_points_partial(
+        world_points, *surface_args(surface))
+    assert result.converged.all()
+    assert (result.distances <= 1e-5).all()
+
+
+def test_partial_inversion_reports_and_retries_failures():
+    surface = create_surface()
+    generator = th.Generator().manual_seed(1)
+    world_points = points_on_surface(surface, random_params(200)) + 1e-2 * (
+        th.randn((200, 3), generator=generator, dtype=th.float64))
+    with pytest.raises(diff_nurbs.NoConvergenceError):
+        diff_nurbs.invert_points(
+            world_points, *surface_args(surface), max_iters=2)
+    evaluation_points, distances = diff_nurbs.invert_points(
+        world_points,
+        *surface_args(surface),
+        max_iters=2,
+        raise_on_failure=False,
+    )
+
+    result = diff_nurbs.invert_points_partial(
+        world_points, *surface_args(surface), max_iters=2, num_retries=0)
+    assert result.evaluation_points.shape == (200, 2)
+    assert result.converged.shape == (200,)
+    assert result.num_iters.shape == (200,)
+    assert not result.converged.all()
+    assert (result.num_iters <= 2).all()
+    assert th.equal(result.evaluation_points, evaluation_points)
+    assert th.equal(result.distances, distances)
+
+    result = diff_nurbs.invert_points_partial(
+        world_points, *surface_args(surface), max_iters=2, num_retries=1)
+    assert result.converged.all()
+    assert (result.distances <= distances + 1e-8).all()
+
+
+def test_warm_start_inverter_needs_fewer_iterations():
+    surface = create_surface()
+    world_points = points_on_surface(surface, random_params(200, seed=1))
+    inverter = diff_nurbs.WarmStartPointInverter(surface)
+    cold_diagnostics = diff_nurbs.InversionDiagnostics()
+    evaluation_points, _ = inverter.invert(world_points, cold_diagnostics)
+    assert evaluation_points.shape == (200, 2)
+
+    generator = th.Generator().manual_seed(1)
+    surface.control_points = surface.control_points + 1e-3 * th.randn(
+        surface.control_points.shape, generator=generator, dtype=th.float64)
+    warm_diagnostics = diff_nurbs.InversionDiagnostics()
+    evaluation_points, distances = inverter.invert(
+        world_points, warm_diagnostics)
+    assert warm_diagnostics.converged.all()
+    assert (
+        warm_diagnostics.num_iters.double().mean()
+        < cold_diagnostics.num_iters.double().mean()
+    )
+    expected_points, expected_distances = diff_nurbs.invert_points(
+        world_points, *surface_args(surface), num_seed_candidates=4)
+    assert th.allclose(evaluation_points, expected_points, atol=1e-6)
+    assert th.allclose(distances, expected_distances, atol=1e-6)
+
+    inverter.reset()
+    assert inverter.evaluation_points is None
+    evaluation_points, _ = inverter.invert(world_points[:10])
+    assert th.allclose(evaluation_points, expected_points[:10], atol=1e-6)
+
+
+def test_implicit_backward_matches_unrolled_gradients():
+    surface = create_surface()
+    params = 0.2 + 0.6 * random_params(50)
+    generator = th.Generator().manual_seed(3)
+    # Points slightly off the surface make for a non-trivial gradient.
+    world_points = points_on_surface(surface, params) + 1e-2 * th.randn(
+        (50, 3), generator=generator, dtype=th.float64)
+
+    grads = []
+    for implicit_backward in [False, True]:
+        control_points = surface.control_points.clone().requires_grad_()
+        curr_world_points = world_points.clone().requires_grad_()
+        evaluation_points, _ = diff_nurbs.invert_points(
+            curr_world_points,
+            surface.degree_x,
+            surface.degree_y,
+            control_points,
+            surface.control_point_weights,
+            surface.knots_x,
+            surface.knots_y,
+            distance_tolerance=1e-12,
+            cosine_tolerance=1e-12,
+            num_seed_candidates=4,
+            implicit_backward=implicit_backward,
+        )
+        grad_output = th.linspace(
+            -1, 1, evaluation_points.numel(), dtype=th.float64)
+        grads.append(th.autograd.grad(
+            evaluation_points,
+            (control_points, curr_world_points),
+            grad_output.reshape(evaluation_points.shape),
+        ))
+    for (grad, implicit_grad) in zip(*grads):
+        assert th.allclose(implicit_grad, grad, atol=1e-8)
+
+
+def test_gradients_reach_points_that_start_on_the_surface():
+    surface = create_surface()
+    surface.control_points.requires_grad_()
+    index = surface.get_inversion_index()
+    generator = th.Generator().manual_seed(4)
+    # Points within the tolerance of the cached samples converge before
+    # the first Newton step.
+    world_points = (
+        index.sample_points[::7].detach() + 1e-7 * th.randn(
+            index.sample_points[::7].shape,
+            generator=generator,
+            dtype=th.float64,
+        )
+    ).requires_grad_()
+    diagnostics = diff_nurbs.InversionDiagnostics()
+    evaluation_points, distances = diff_nurbs.invert_points(
+        world_points,
+        *surface_args(surface),
+        diagnostics=diagnostics,
+        sample_index=index,
+    )
+    assert (diagnostics.num_iters == 0).all()
+    grads = th.autograd.grad(
+        distances.sum(), (surface.control_points, world_points))
+
+    expected_distances = th.linalg.norm(
+        points_on_surface(surface, evaluation_points) - world_points,
+        dim=-1,
+    )
+    assert th.allclose(distances, expected_distances)
+    expected_grads = th.autograd.grad(
+        expected_distances.sum(), (surface.control_points, world_points))
+    for (grad, expected_grad) in zip(grads, expected_grads):
+        assert th.allclose(grad, expected_grad)
@@ -0,0 +1,76 @@
+import pytest
+import torch as th
+
+import diff_nurbs
+
+
+def uniform_knots(degree: int, num_control_points: int) -> th.Tensor:
+    return th.cat([
+        th.zeros(degree),
+        th.linspace(0, 1, num_control_points - degree + 1),
+        th.ones(degree),
+    ]).double()
+
+
+@pytest.mark.parametrize('degree', [1, 2, 3, 5])
+@pytest.mark.parametrize('extra_control_points', [1, 2, 9, 31])
+def test_find_span_matches_searchsorted(degree, extra_control_points):
+    num_control_points = degree + extra_control_points
+    knots = uniform_knots(degree, num_control_points)
+    assert diff_nurbs.is_uniform_knots(degree, num_control_points, knots)
+    points = th.cat([th.rand(1000, dtype=th.float64), knots])
+    expected = diff_nurbs.find_span(points, degree, num_control_points, knots)
+
+    spans = diff_nurbs.find_span(
+        points, degree, num_control_points, knots, uniform=True)
+    assert th.equal(spans, expected)
+
+    batched_spans = diff_nurbs.find_span(
+        points,
+        degree,
+        num_control_points,
+        knots.expand(3, -1),
+        uniform=True,
+    )
+    assert th.equal(batched_spans, expected.expand(3, -1))
+
+    sorted_points, order = points.sort()
+    spans = diff_nurbs.find_span(
+        sorted_points,
+        degree,
+        num_control_points,
+        knots,
+        sorted_points=True,
+    )
+    assert th.equal(spans, expected[order])
+
+
+def test_surface_span_search_flags():
+    surface = diff_nurbs.NURBSSurface.create_example()
+    points = th.linspace(0, 1, 50)
+    expected = surface.evaluate(points, points)
+    for kwargs in [{'uniform_knots': True}, {'sorted_points': True}]:
+        surface_points = diff_nurbs.evaluate_nurbs_surface_flex(
+            points,
+            points,
+            surface.degree_x,
+            surface.degree_y,
+            surface.control_points,
+            surface.control_point_weights,
+            surface.knots_x,
+            surface.knots_y,
+            **kwargs,
+        )
+        assert th.allclose(surface_points, expected)
+        derivs = diff_nurbs.calc_derivs_surface(
+            points,
+            points,
+            surface.degree_x,
+            surface.degree_y,
+            surface.control_points,
+            surface.control_point_weights,
+            surface.knots_x,
+            surface.knots_y,
+            **kwargs,
+        )
+        assert th.allclose(derivs[:, 0, 0], expected)
@@ -0,0 +1,321 @@
+import warnings
+
+import pytest
+import torch as th
+
+import diff_nurbs
+from diff_nurbs import nurbs
+
+
+def create_surface() -> diff_nurbs.NURBSSurface:
+    surface = diff_nurbs.NURBSSurface.create_example()
+    generator = th.Generator().manual_seed(0)
+    surface.control_point_weights[:] = 0.5 + th.rand(
+        surface.control_point_weights.shape, generator=generator)
+    return surface
+
+
+def evaluation_points(num_points: int = 100) -> th.Tensor:
+    generator = th.Generator().manual_seed(1)
+    return th.rand((2, num_points), generator=generator)
+
+
+def test_power_basis_matches_default():
+    surface = create_surface()
+    points_x, points_y = evaluation_points()
+    power_basis_x, power_basis_y = surface.calc_power_basis()
+    derivs = diff_nurbs.calc_derivs_surface(
+        points_x,
+        points_y,
+        surface.degree_x,
+        surface.degree_y,
+        surface.control_points,
+        surface.control_point_weights,
+        surface.knots_x,
+        surface.knots_y,
+        nth_deriv=2,
+        power_basis_x=power_basis_x,
+        power_basis_y=power_basis_y,
+    )
+    expected = surface.calc_derivs(points_x, points_y, nth_deriv=2)
+    assert th.allclose(derivs, expected, atol=1e-4)
+
+
+def test_bezier_extraction_matches_default():
+    surface = create_surface()
+    points_x, points_y = evaluation_points()
+    extraction_x, extraction_y = surface.calc_bezier_extraction()
+    surface_points = diff_nurbs.evaluate_nurbs_surface_bezier(
+        points_x,
+        points_y,
+        extraction_x,
+        extraction_y,
+        surface.control_points,
+        surface.control_point_weights,
+    )
+    assert th.allclose(
+        surface_points, surface.evaluate(points_x, points_y), atol=1e-5)
+    derivs = diff_nurbs.calc_derivs_surface_bezier(
+        points_x,
+        points_y,
+        extraction_x,
+        extraction_y,
+        surface.control_points,
+        surface.control_point_weights,
+        nth_deriv=2,
+    )
+    expected = surface.calc_derivs(points_x, points_y, nth_deriv=2)
+    assert th.allclose(derivs, expected, atol=1e-3)
+
+
+@pytest.mark.parametrize('use_sparse_csr', [
+    pytest.param(True, marks=pytest.mark.skipif(
+        not nurbs._USE_SPARSE_CSR, reason='sparse CSR is not supported')),
+    False,
+])
+def test_evaluation_operators_match_default(monkeypatch, use_sparse_csr):
+    monkeypatch.setattr(nurbs, '_USE_SPARSE_CSR', use_sparse_csr)
+    surface = create_surface()
+    points_x, points_y = evaluation_points()
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        operators = surface.calc_evaluation_operators(
+            points_x, points_y, nth_deriv=2)
+    assert operators[0][0].layout == (
+        th.sparse_csr if use_sparse_csr else th.sparse_coo)
+    control_points = surface.control_points.detach().requires_grad_()
+    derivs = diff_nurbs.evaluate_nurbs_surface_with_operators(
+        operators, control_points, surface.control_point_weights)
+    expected = surface.calc_derivs(points_x, points_y, nth_deriv=2)
+    assert th.allclose(derivs, expected, atol=1e-4)
+
+    (grad,) = th.autograd.grad(derivs[:, 0, 0].sum(), control_points)
+    (expected_grad,) = th.autograd.grad(
+        diff_nurbs.evaluate_nurbs_surface_flex(
+            points_x,
+            points_y,
+            surface.degree_x,
+            surface.degree_y,
+            control_points,
+            surface.control_point_weights,
+            surface.knots_x,
+            surface.knots_y,
+        ).sum(),
+        control_points,
+    )
+    assert th.allclose(grad, expected_grad, atol=1e-4)
+
+
+def surface_args(surface, control_points, control_point_weights):
+    points_x, points_y = evaluation_points()
+    return (
+        points_x,
+        points_y,
+        surface.degree_x,
+        surface.degree_y,
+        control_points,
+        control_point_weights,
+        surface.knots_x,
+        surface.knots_y,
+    )
+
+
+@pytest.mark.parametrize('func', [
+    diff_nurbs.evaluate_nurbs_surface_flex,
+    diff_nurbs.calc_derivs_surface,
+    diff_nurbs.calc_normals_surface,
+])
+@pytest.mark.parametrize('batched', [False, True])
+def test_manual_backward_matches_autograd(func, batched):
+    surface = create_surface()
+    control_points = surface.control_points.detach()
+    control_point_weights = surface.control_point_weights.detach()
+    if batched:
+        control_points = th.stack([control_points, control_points.flip(0)])
+        control_point_weights = control_point_weights.expand(2, -1, -1, -1)
+
+    grads = []
+    for manual_backward in [False, True]:
+        params = (
+            control_points.clone().requires_grad_(),
+            control_point_weights.clone().requires_grad_(),
+        )
+        result = func(
+            *surface_args(surface, *params),
+            manual_backward=manual_backward,
+        )
+        grad_output = th.linspace(-1, 1, result.numel())
+        grads.append(th.autograd.grad(
+            result, params, grad_output.reshape(result.shape)))
+    for (grad, manual_grad) in zip(*grads):
+        assert th.allclose(manual_grad, grad, atol=1e-4)
+
+
+@pytest.mark.parametrize('manual_backward', [False, True])
+def test_contraction_loop_matches_patch_gather(monkeypatch, manual_backward):
+    surface = create_surface()
+    results = []
+    for max_loop_patch_size in [16, 0]:
+        monkeypatch.setattr(
+            nurbs, '_MAX_LOOP_PATCH_SIZE', max_loop_patch_size)
+        control_points = surface.control_points.detach().requires_grad_()
+        surface_points = diff_nurbs.evaluate_nurbs_surface_flex(
+            *surface_args(
+                surface, control_points, surface.control_point_weights),
+            manual_backward=manual_backward,
+        )
+        (grad,) = th.autograd.grad(surface_points.sum(), control_points)
+        results.append((surface_points, grad))
+    for (loop_result, gather_result) in zip(*results):
+        assert th.allclose(loop_result, gather_result, atol=1e-6)
+
+
+def test_manual_backward_is_once_differentiable():
+    surface = create_surface()
+    control_points = surface.control_points.detach().requires_grad_()
+    surface_points = diff_nurbs.evaluate_nurbs_surface_flex(
+        *surface_args(
+            surface, control_points, surface.control_point_weights),
+        manual_backward=True,
+    )
+    (grad,) = th.autograd.grad(
+        surface_points.square().sum(), control_points, create_graph=True)
+    with pytest.raises(RuntimeError):
+        grad.sum().backward()
+
+
+def test_grid_matches_flex():
+    surface = create_surface()
+    points_x = th.linspace(0, 1, 7)
+    points_y = th.linspace(0, 1, 5)
+    grid_x, grid_y = th.meshgrid(points_x, points_y, indexing='ij')
+    args = (
+        surface.degree_x,
+        surface.degree_y,
+        surface.control_points,
+        surface.control_point_weights,
+        surface.knots_x,
+        surface.knots_y,
+    )
+    expected = diff_nurbs.calc_derivs_surface(
+        grid_x.flatten(), grid_y.flatten(), *args, nth_deriv=2)
+    expected = expected.reshape((7, 5) + expected.shape[1:])
+
+    surface_points = diff_nurbs.evaluate_nurbs_surface_grid(
+        points_x, points_y, *args)
+    assert surface_points.shape == (7, 5, 3)
+    assert th.allclose(surface_points, expected[:, :, 0, 0], atol=1e-5)
+    derivs = diff_nurbs.calc_derivs_surface_grid(
+        points_x, points_y, *args, nth_deriv=2, sorted_points=True)
+    assert derivs.shape == (7, 5, 3, 3, 3)
+    assert th.allclose(derivs, expected, atol=1e-3)
+    normals = diff_nurbs.calc_normals_surface_grid(points_x, points_y, *args)
+    assert th.allclose(
+        normals,
+        diff_nurbs.calc_normals_surface(
+            grid_x.flatten(), grid_y.flatten(), *args).reshape(7, 5, 3),
+        atol=1e-5,
+    )
+
+
+def test_basis_derivs_matrix_matches_basis_derivs():
+    surface = create_surface()
+    points_x, _ = evaluation_points()
+    num_control_points = surface.control_points.shape[0]
+    basis_mats = diff_nurbs.calc_basis_derivs_matrix(
+        points_x, surface.degree_x, num_control_points, surface.knots_x, 2)
+    assert basis_mats.shape == (3, len(points_x), num_control_points)
+    spans = diff_nurbs.find_span(
+        points_x, surface.degree_x, num_control_points, surface.knots_x)
+    basis_derivs = diff_nurbs.calc_basis_derivs(
+        points_x, spans, surface.degree_x, surface.knots_x, 2)
+    indices = (
+        spans.unsqueeze(-1)
+        - surface.degree_x
+        + th.arange(surface.degree_x + 1)
+    )
+    local_mats = basis_mats[:, th.arange(len(points_x)).unsqueeze(-1), indices]
+    assert th.allclose(local_mats, basis_derivs.movedim(-2, 0))
+    assert th.allclose(basis_mats[0].sum(-1), th.ones(len(points_x)))
+
+
+@pytest.mark.parametrize('shared_points', [False, True])
+def test_batched_surfaces_match_single_surfaces(shared_points):
+    surface = create_surface()
+    generator = th.Generator().manual_seed(2)
+    batch_size = 3
+    control_points = surface.control_points + 0.1 * th.rand(
+        (batch_size,) + surface.control_points.shape, generator=generator)
+    control_point_weights = surface.control_point_weights.expand(
+        batch_size, -1, -1, -1)
+    knots_x = surface.knots_x.expand(batch_size, -1)
+    if shared_points:
+        points_x, points_y = evaluation_points()
+    else:
+        points_x, points_y = th.rand(
+            (2, batch_size, 100), generator=generator)
+
+    surface_points = diff_nurbs.evaluate_nurbs_surface_flex(
+        points_x,
+        points_y,
+        surface.degree_x,
+        surface.degree_y,
+        control_points,
+        control_point_weights,
+        knots_x,
+        surface.knots_y,
+    )
+    derivs = diff_nurbs.calc_derivs_surface(
+        points_x,
+        points_y,
+        surface.degree_x,
+        surface.degree_y,
+        control_points,
+        control_point_weights,
+        knots_x,
+        surface.knots_y,
+        nth_deriv=2,
+    )
+    grid = diff_nurbs.evaluate_nurbs_surface_grid(
+        th.linspace(0, 1, 4),
+        th.linspace(0, 1, 6),
+        surface.degree_x,
+        surface.degree_y,
+        control_points,
+        control_point_weights,
+        knots_x,
+        surface.knots_y,
+    )
+    assert surface_points.shape == (batch_size, 100, 3)
+    assert derivs.shape == (batch_size, 100, 3, 3, 3)
+    assert grid.shape == (batch_size, 4, 6, 3)
+    for i in range(batch_size):
+        single_surface = diff_nurbs.NURBSSurface(
+            surface.degree_x,
+            surface.degree_y,
+            control_points[i],
+            control_point_weights[i],
+            knots_x[i],
+            surface.knots_y,
+        )
+        single_x = points_x if shared_points else points_x[i]
+        single_y = points_y if shared_points else points_y[i]
+        assert th.allclose(
+            surface_points[i], single_surface.evaluate(single_x, single_y))
+        assert th.allclose(
+            derivs[i],
+            single_surface.calc_derivs(single_x, single_y, nth_deriv=2),
+        )
+        assert th.allclose(
+            grid[i],
+            diff_nurbs.evaluate_nurbs_surface_grid(
+                th.linspace(0, 1, 4),
+                th.linspace(0, 1, 6),
+                surface.degree_x,
+                surface.degree_y,
+                control_points[i],
+                control_point_weights[i],
+                knots_x[i],
+                surface.knots_y,
+            ),
+        )